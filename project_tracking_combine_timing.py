@@ -0,0 +1,50 @@
+"""
+Script documentation
+
+- Tool parameters are accessed using arcpy.GetParameter() or 
+                                     arcpy.GetParameterAsText()
+- Update derived parameter values using arcpy.SetParameter() or
+                                        arcpy.SetParameterAsText()
+"""
+import arcpy
+import csv
+import os
+from project_tracking_quantiles import merge_sketch_files, summarize
+
+
+def script_tool(sketch_files, output_csv):
+    """Combines the timing sketches saved by the data update tool for several projects into one report"""
+    # Each sketch file is a snapshot of a whole project, so a project merged twice would count its HUCs twice
+    projects = {}
+    for path in sketch_files:
+        project = os.path.basename(path).split("_Timing_Sketches_")[0]
+        if project in projects:
+            arcpy.AddError(f"{path} and {projects[project]} are both from {project}. Select one sketch file per project.")
+            return
+        projects[project] = path
+
+    try:
+        merged = merge_sketch_files(sketch_files)
+    except Exception as e:
+        arcpy.AddError(f'Unable to read the timing sketch files. Ensure they were created by the data update tool.\n\n{e}')
+        return
+
+    # write the Median, P90 and P99 hours per HUC of every editor and team process across the projects
+    with open(output_csv, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(["Group", "Name", "Process", "HUC_Ct", "Median_Hrs", "P90_Hrs", "P99_Hrs"])
+        for group in ["editors", "teams"]:
+            for name, processes in sorted(merged.get(group, {}).items()):
+                for process, sketch in processes.items():
+                    writer.writerow([group[:-1].title(), name, process, sketch.count] + summarize(sketch))
+
+    arcpy.AddMessage(f"Combined timing of {len(projects)} projects written to {output_csv}")
+
+    return
+
+
+if __name__ == "__main__":
+    sketch_files = arcpy.GetParameterAsText(0) # timing sketch files separated by ;, one per project
+    output_csv = arcpy.GetParameterAsText(1)
+
+    script_tool([path.strip("'") for path in sketch_files.split(";") if path], output_csv)
@@ -9,12 +9,14 @@ Script documentation
 import arcpy
 import csv
 import datetime as dt
-from arcgis.gis import GIS
 import os
+from project_tracking_quantiles import QuantileSketch, save_sketches, summarize
+from project_tracking_session import get_gis
 
 
-def script_tool(param0):
+def script_tool(param0, huc_results=None):
     CO_table_path = param0
+    huc_results = huc_results or {} # OBJECTID -> (POLY_CT, POLY_AREA_ACRES, POLY_LENGTH_KM) passed in by the pipeline tool
 
     # Iterates over CO table and creates dictionaries to hold stats values
     def generate_stats_dicts(co_path):
@@ -39,21 +41,26 @@ def script_tool(param0):
         team_prog_track_lp = {team: [0] * 4 for team in teams}
         proj_prog_track_lp = {team: [0] * 12 for team in teams}
 
-        return editor_stats_lp, team_edit_stats_lp, team_prog_track_lp, proj_prog_track_lp, teams
+        # Quantile sketches of the hours per HUC, filled in the same cursor passes as the sums
+        timing_sketches_lp = {"editors": {editor: {"Map": QuantileSketch()} for editor in editors},
+                              "teams": {team: {"Map": QuantileSketch(), "QA": QuantileSketch(),
+                                               "Finalize": QuantileSketch(), "Total": QuantileSketch()} for team in teams}}
+
+        return editor_stats_lp, team_edit_stats_lp, team_prog_track_lp, proj_prog_track_lp, timing_sketches_lp, teams
 
 
     # Call create dict function and save returned dicts
     try:
-        editor_stats, team_estats, team_prog_track, proj_prog_track, proj_array = generate_stats_dicts(CO_table_path)
+        editor_stats, team_estats, team_prog_track, proj_prog_track, timing_sketches, proj_array = generate_stats_dicts(CO_table_path)
     except Exception as e:
         arcpy.AddError('The selected Feature Class does not have the required fields Editor or TeamTMU. Choose a different Feature Class')
         return
     
     # Function to iterate over CO table and populate dicts with editing stats
-    def populate_edit_dicts(co_path, editor_stats_lp, team_edit_stats_lp):
+    def populate_edit_dicts(co_path, editor_stats_lp, team_edit_stats_lp, editor_sketches_lp):
         # Iterate over table and pull needed values into appropriate dicts
         with arcpy.da.SearchCursor(co_path, ['Editor', 'TeamTMU', 'POLY_CT', 'POLY_AREA_ACRES', 'POLY_LENGTH_KM',
-                                            'MAPPING_HRS']) as cursor:
+                                            'MAPPING_HRS', 'OID@']) as cursor:
             for row in cursor:
                 editor = row[0]
                 team = row[1]
@@ -62,6 +69,10 @@ def script_tool(param0):
                 poly_length = row[4]
                 map_hrs = row[5]
 
+                # Use freshly extracted values if they have not been written to the layer yet
+                if row[6] in huc_results:
+                    poly_ct, poly_area, poly_length = huc_results[row[6]]
+
                 if editor in editor_stats_lp:
                     editor_stats_lp[editor][0] += int(poly_ct)
                     editor_stats_lp[editor][1] += float(poly_length)
@@ -69,6 +80,7 @@ def script_tool(param0):
 
                 if editor in editor_stats and map_hrs > 1:
                     editor_stats_lp[editor][3] += float(map_hrs)
+                    editor_sketches_lp[editor]["Map"].update(map_hrs)
 
                 if team in team_edit_stats_lp:
                     team_edit_stats_lp[team][0] += int(poly_ct)
@@ -98,13 +110,13 @@ def script_tool(param0):
     # Call populate_edit_dicts and save the results to the appropriate dict
     try:
         editor_stats, team_estats = populate_edit_dicts(co_path=CO_table_path, editor_stats_lp=editor_stats,
-                                                    team_edit_stats_lp=team_estats)
+                                                    team_edit_stats_lp=team_estats, editor_sketches_lp=timing_sketches["editors"])
     except Exception as e:
         arcpy.AddError('The selected Feature Class does not have the required fields POLY_CT, POLY_AREA_ACRES, POLY_LENGTH_KM, or MAPPING_HRS. Choose a different Feature Class')
         return
     
     # Function to iterate over CO table and populate dicts with project progress stats
-    def populate_prog_dicts(co_path, team_prog_track_lp, proj_prog_track_lp):
+    def populate_prog_dicts(co_path, team_prog_track_lp, proj_prog_track_lp, team_sketches_lp):
         # Iterate over CO layer and do sums and counts
         with arcpy.da.SearchCursor(co_path,
                                 ['HUC12', 'TeamTMU', 'Editor', 'MAPPING_HRS', 'QA_REVIEW_HRS', 'QA_REVISION_HRS',
@@ -136,6 +148,7 @@ def script_tool(param0):
                 if map_hr > 1:
                     proj_prog_track_lp[team][3] += 1
                     team_prog_track_lp[team][0] += float(map_hr)
+                    team_sketches_lp[team]["Map"].update(map_hr)
 
                 # Count HUCs currently in QA
                 if map_hr > 1 and (qa_review is None or qa_revision is None):
@@ -145,6 +158,7 @@ def script_tool(param0):
                 if qa_review is not None and qa_revision is not None:
                     proj_prog_track_lp[team][5] += 1
                     team_prog_track_lp[team][1] += float(qa_total)
+                    team_sketches_lp[team]["QA"].update(qa_total)
 
                 # Count Hucs currently in finalization
                 if qa_revision is not None and final is None:
@@ -155,6 +169,8 @@ def script_tool(param0):
                     proj_prog_track_lp[team][7] += 1
                     team_prog_track_lp[team][2] += float(final)
                     team_prog_track_lp[team][3] += float(total)
+                    team_sketches_lp[team]["Finalize"].update(final)
+                    team_sketches_lp[team]["Total"].update(total)
 
         for team in proj_prog_track_lp:
             if proj_prog_track_lp[team][3] > 0:
@@ -171,10 +187,19 @@ def script_tool(param0):
     # Call populate_por_dicts and update values in dictionaries
     try:
         team_prog_track, proj_prog_track = populate_prog_dicts(co_path=CO_table_path, team_prog_track_lp=team_prog_track,
-                                                        proj_prog_track_lp=proj_prog_track)
+                                                        proj_prog_track_lp=proj_prog_track, team_sketches_lp=timing_sketches["teams"])
     except Exception as e:
         arcpy.AddError('The selected Feature Class does not have the required fields. Choose a different Feature Class')
         return
+
+    # add Median, P90 and P99 mapping hours per HUC for each editor
+    for editor in editor_stats:
+        editor_stats[editor] += summarize(timing_sketches["editors"][editor]["Map"])
+
+    # add Median, P90 and P99 hours per HUC for each process of each team
+    for team in proj_prog_track:
+        for process in ["Map", "QA", "Finalize", "Total"]:
+            proj_prog_track[team] += summarize(timing_sketches["teams"][team][process])
     
     ### Set up for writing csv and appened hosted tables ###
     CO_path_split = CO_table_path.split("\\")
@@ -200,7 +225,7 @@ def script_tool(param0):
     
     # Set up Editor tracking table to be written
     ett_columns = ["Editor", "Poly_Ct", "Poly_Length_KM", "Poly_Area_Acres", "Map_Hrs", "Poly_Per_Hr", "Acres_Per_Hr",
-                "KM_Per_Hr"]
+                "KM_Per_Hr", "Median_Map_Hrs", "P90_Map_Hrs", "P99_Map_Hrs"]
     ett_date_name = f"{proj_name}_Editor_Tracking_{current_date}.csv"
     ett_date_out = os.path.join(output_path, ett_date_name)
     ett_intermediate_prop = {"title": ett_date_name, "type": "CSV",
@@ -230,7 +255,9 @@ def script_tool(param0):
     # set up project tracking table to be written
     ptt_columns = ["Team", "Total_HUCs", "HUCs_Not_Started", "HUCs_Mapping_IP", "HUCs_Mapped", "HUCs_QA_IP", "HUCs_QA_Done",
                 "HUCs_Finalize_IP", "HUCs_Finalized", "Mean_Map_Time", "Mean_QA_Time", "Mean_Finalize_Time",
-                "Mean_Total_Time"]
+                "Mean_Total_Time", "Median_Map_Time", "P90_Map_Time", "P99_Map_Time", "Median_QA_Time", "P90_QA_Time",
+                "P99_QA_Time", "Median_Finalize_Time", "P90_Finalize_Time", "P99_Finalize_Time", "Median_Total_Time",
+                "P90_Total_Time", "P99_Total_Time"]
     ptt_date_name = f"{proj_name}_Project_Tracking_{current_date}.csv"
     ptt_date_out = os.path.join(output_path, ptt_date_name)
     ptt_intermediate_prop = {"title": ptt_date_name, "type": "CSV",
@@ -277,10 +304,13 @@ def script_tool(param0):
                         team_estats_lp=team_estats, ttt_write_array_lp=ttt_write_array, team_proglp=team_prog_track,
                         ptt_write_array_lp=ptt_write_array, proj_tracklp=proj_prog_track)
 
+    # Save the timing sketches so projects can be combined by project_tracking_combine_timing without rescanning the CO tables
+    save_sketches(os.path.join(output_path, f"{proj_name}_Timing_Sketches_{current_date}.json"), timing_sketches)
+
     #### Retrive hosted tables from online ####
     # Authenicate API
     try:
-        gis = GIS('Pro')
+        gis = get_gis('Pro') # reuses the session from earlier runs
 
 
         # Add csvs to arcOnline and return intermediate table items
@@ -332,25 +362,31 @@ def script_tool(param0):
             return
 
 
+        # Returns the columns that exist in the hosted table, tables created before a column was added are skipped for it
+        def hosted_columns(fs_table_fn, columns):
+            hosted_fields = [field["name"].lower() for field in fs_table_fn.properties.fields]
+            return [column for column in columns if column.lower() in hosted_fields]
+
+
         # Appends EB Tables and deletes intermediate tables
         def append_fs_tables(ett_write_array_fn, ett_fs_fn, ett_int_item_fn, ett_si_fn, tet_write_array_fn, tet_fs_fn,
                             tet_int_item_fn, tet_si_fn, ttt_write_array_fn, ttt_fs_fn, ttt_int_item_fn, ttt_si_fn,
                             ptt_write_array_fn, ptt_fs_fn, ptt_int_item_fn, ptt_si_fn):
             ett_fs_fn.append(source_table_name=ett_write_array_fn[1], item_id=ett_int_item_fn.id, upload_format='csv',
                             source_info=ett_si_fn['publishParameters'], upsert=True, update_geometry=False,
-                            append_fields=ett_write_array_fn[0], skip_inserts=False, upsert_matching_field='Editor')
+                            append_fields=hosted_columns(ett_fs_fn, ett_write_array_fn[0]), skip_inserts=False, upsert_matching_field='Editor')
 
             tet_fs_fn.append(source_table_name=tet_write_array_fn[1], item_id=tet_int_item_fn.id, upload_format='csv',
                             source_info=tet_si_fn['publishParameters'], upsert=True, update_geometry=False,
-                            append_fields=tet_write_array_fn[0], skip_inserts=False, upsert_matching_field='Team')
+                            append_fields=hosted_columns(tet_fs_fn, tet_write_array_fn[0]), skip_inserts=False, upsert_matching_field='Team')
 
             ttt_fs_fn.append(source_table_name=ttt_write_array_fn[1], item_id=ttt_int_item_fn.id, upload_format='csv',
                             source_info=ttt_si_fn['publishParameters'], upsert=True, update_geometry=False,
-                            append_fields=ttt_write_array_fn[0], skip_inserts=False, upsert_matching_field='Team')
+                            append_fields=hosted_columns(ttt_fs_fn, ttt_write_array_fn[0]), skip_inserts=False, upsert_matching_field='Team')
 
             ptt_fs_fn.append(source_table_name=ptt_write_array_fn[1], item_id=ptt_int_item_fn.id, upload_format='csv',
                             source_info=ptt_si_fn['publishParameters'], upsert=True, update_geometry=False,
-                            append_fields=ptt_write_array_fn[0], skip_inserts=False, upsert_matching_field='Team')
+                            append_fields=hosted_columns(ptt_fs_fn, ptt_write_array_fn[0]), skip_inserts=False, upsert_matching_field='Team')
 
             ett_int_item_fn.delete()
             tet_int_item_fn.delete()
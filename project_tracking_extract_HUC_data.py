@@ -1,6 +1,471 @@
 import arcpy
+import hashlib
+import heapq
+import json
+import multiprocessing
+import os
+import sys
+from project_tracking_huc_cache import dataset_mtime, load_huc_geometries, restamp_cache
 
-def script_tool(selecting_feature, polys_feature):
+REDUCED_CHANGE_WARN_PCT = 0.5 # warn when the reduction pre-pass moves the area or length totals by more than this percent
+REDUCED_CACHE_GDB = os.path.join(os.environ.get("LOCALAPPDATA", os.path.expanduser("~")), "ProjectTracking", "ReducedPolygons.gdb") # per-user cache of reduced copies
+REDUCED_CACHE_MANIFEST = os.path.join(os.path.dirname(REDUCED_CACHE_GDB), "reduced_polygons.json") # area/length stats of each cached copy
+
+# Relative cost model used to order and plan parallel runs. The weights are not calibrated to seconds, so costs
+# are only meaningful compared to each other.
+HUC_BASE_COST = 1 # select, clip and cursor overhead of every HUC
+POLYGON_COST = 0.004 # per candidate polygon
+VERTEX_COST = 0.00004 # per candidate polygon vertex
+
+BYTES_PER_VERTEX = 64 # rough memory used per vertex of a polygon and its clipped output, used to size tiles
+MAX_TILE_DEPTH = 8 # how many times a dense tile can be split into quarters
+
+_worker_state = {} # feature layer and HUC geometries of a parallel worker process
+
+
+# Snaps every vertex of a polygon to a grid of the given size (in the units of the feature class)
+def snap_polygon(polygon, snap_grid):
+    parts = arcpy.Array()
+    for part in polygon:
+        points = []
+        for pnt in part:
+            if pnt is None: # keep the None separating the interior rings so they stay holes of this part
+                points.append(None)
+                continue
+            points.append(arcpy.Point(round(pnt.X / snap_grid) * snap_grid, round(pnt.Y / snap_grid) * snap_grid))
+        parts.add(arcpy.Array(points))
+
+    return arcpy.Polygon(parts, polygon.spatialReference)
+
+
+# Reports how much the reduction changed the area and length totals
+def report_reduction_change(stats):
+    area_change = abs(stats["reduced_area"] - stats["source_area"]) / stats["source_area"] * 100 if stats["source_area"] else 0
+    length_change = abs(stats["reduced_length"] - stats["source_length"]) / stats["source_length"] * 100 if stats["source_length"] else 0
+    arcpy.AddMessage(f"Area change from reduction: {round(area_change, 3)}%")
+    arcpy.AddMessage(f"Length change from reduction: {round(length_change, 3)}%")
+    if area_change > REDUCED_CHANGE_WARN_PCT or length_change > REDUCED_CHANGE_WARN_PCT:
+        arcpy.AddWarning(f"Reduction changed the totals by more than {REDUCED_CHANGE_WARN_PCT}%. Consider a smaller snapping grid or simplification tolerance.")
+
+
+def _read_reduced_manifest():
+    if not os.path.exists(REDUCED_CACHE_MANIFEST):
+        return {}
+    with open(REDUCED_CACHE_MANIFEST) as file:
+        return json.load(file)
+
+
+def _write_reduced_manifest(manifest):
+    with open(f"{REDUCED_CACHE_MANIFEST}.tmp", mode='w') as file:
+        json.dump(manifest, file)
+    os.replace(f"{REDUCED_CACHE_MANIFEST}.tmp", REDUCED_CACHE_MANIFEST)
+
+
+# Creates (or reuses) a copy of the polygons with coordinates snapped to a grid and simplified within a tolerance.
+# Copies are kept in a per-user cache geodatabase, keyed by the source path, the settings and a hash of every geometry.
+def reduce_polygons(feature_layer, snap_grid, simplify_tolerance):
+    source_path = arcpy.Describe(feature_layer).catalogPath
+
+    # hash the source geometries so any moved or reshaped polygon gives a new key, and sum the source totals
+    geometry_hash = hashlib.sha1()
+    source_area = 0
+    source_length = 0
+    with arcpy.da.SearchCursor(feature_layer, ["OID@", "SHAPE@WKB", "SHAPE@AREA", "SHAPE@LENGTH"]) as cursor:
+        for row in cursor:
+            geometry_hash.update(str(row[0]).encode("utf-8"))
+            geometry_hash.update(bytes(row[1] or b""))
+            source_area += row[2] or 0
+            source_length += row[3] or 0
+
+    source_key = f"{os.path.abspath(source_path).lower()}|{snap_grid or 0:g}|{simplify_tolerance or 0:g}"
+    cache_key = hashlib.sha1(f"{source_key}|{geometry_hash.hexdigest()}".encode("utf-8")).hexdigest()[:20]
+    reduced_layer = os.path.join(REDUCED_CACHE_GDB, f"REDUCED_{cache_key}")
+
+    if not arcpy.Exists(REDUCED_CACHE_GDB):
+        os.makedirs(os.path.dirname(REDUCED_CACHE_GDB), exist_ok=True)
+        arcpy.CreateFileGDB_management(os.path.dirname(REDUCED_CACHE_GDB), os.path.basename(REDUCED_CACHE_GDB))
+
+    manifest = _read_reduced_manifest()
+    if cache_key in manifest and arcpy.Exists(reduced_layer): # source is unchanged since the cache was built
+        arcpy.AddMessage(f"Using cached reduced polygons {reduced_layer}")
+        report_reduction_change(manifest[cache_key])
+        return reduced_layer
+
+    # delete the stale copy built from an older version of this source with the same settings
+    for old_key, old_stats in list(manifest.items()):
+        if old_stats["source_key"] == source_key:
+            old_layer = os.path.join(REDUCED_CACHE_GDB, f"REDUCED_{old_key}")
+            if arcpy.Exists(old_layer):
+                arcpy.Delete_management(old_layer)
+            del manifest[old_key]
+
+    arcpy.AddMessage(f"Building reduced polygons {reduced_layer}...")
+    if arcpy.Exists(reduced_layer):
+        arcpy.Delete_management(reduced_layer) # left over from an interrupted build
+
+    arcpy.CopyFeatures_management(feature_layer, reduced_layer)
+
+    reduced_area = 0
+    reduced_length = 0
+    with arcpy.da.UpdateCursor(reduced_layer, ["SHAPE@"]) as cursor:
+        for row in cursor:
+            polygon = row[0]
+            if polygon is None:
+                continue
+
+            reduced = polygon
+            if snap_grid:
+                reduced = snap_polygon(reduced, snap_grid)
+            if simplify_tolerance:
+                reduced = reduced.generalize(simplify_tolerance)
+
+            if reduced.area <= 0: # polygon collapsed, keep the original so it is still counted
+                reduced = polygon
+
+            reduced_area += reduced.area
+            reduced_length += reduced.length
+            row[0] = reduced
+            cursor.updateRow(row)
+
+    manifest[cache_key] = {"source_key": source_key, "source_area": source_area, "source_length": source_length,
+                           "reduced_area": reduced_area, "reduced_length": reduced_length}
+    _write_reduced_manifest(manifest)
+
+    report_reduction_change(manifest[cache_key])
+    return reduced_layer
+
+
+# Builds a uniform grid spatial index mapping each grid cell to the indexes of the extents that touch it
+def build_grid_index(extents, cell_size):
+    grid_index = {}
+    for i, extent in enumerate(extents):
+        for col in range(int(extent.XMin // cell_size), int(extent.XMax // cell_size) + 1):
+            for row in range(int(extent.YMin // cell_size), int(extent.YMax // cell_size) + 1):
+                grid_index.setdefault((col, row), []).append(i)
+
+    return grid_index
+
+
+# Checks if two extents overlap
+def extents_overlap(a, b):
+    return a.XMin <= b.XMax and b.XMin <= a.XMax and a.YMin <= b.YMax and b.YMin <= a.YMax
+
+
+# Finds pairs of geometries whose extents overlap using the grid index so only nearby geometries are compared
+def candidate_pairs(geometries):
+    extents = [geometry.extent for geometry in geometries]
+    if not extents:
+        return set()
+
+    # size cells from the average extent so each geometry lands in only a few cells
+    cell_size = sum(max(extent.width, extent.height) for extent in extents) / len(extents) or 1
+
+    pairs = set()
+    for cell_members in build_grid_index(extents, cell_size).values():
+        for a in range(len(cell_members)):
+            for b in range(a + 1, len(cell_members)):
+                i, j = cell_members[a], cell_members[b]
+                if extents_overlap(extents[i], extents[j]):
+                    pairs.add((i, j))
+
+    return pairs
+
+
+# Calculates the area covered more than once and the number of overlapping pairs without dissolving the layer
+def overlap_stats(features):
+    geometries = []
+    with arcpy.da.SearchCursor(features, ["SHAPE@"]) as cursor:
+        for row in cursor:
+            if row[0] is not None:
+                geometries.append(row[0])
+
+    # intersect each candidate pair and keep the overlaps grouped by the later geometry of the pair
+    overlaps = {}
+    overlap_count = 0
+    for i, j in candidate_pairs(geometries):
+        overlap = geometries[i].intersect(geometries[j], 4)
+        if overlap.area > 0:
+            overlap_count += 1
+            overlaps.setdefault(max(i, j), []).append(overlap)
+
+    # area(union) = sum of area(geometry - earlier geometries), so subtract the union of each geometry's overlaps once
+    overlap_area = 0
+    for pieces in overlaps.values():
+        covered = pieces[0]
+        for piece in pieces[1:]:
+            covered = covered.union(piece)
+        overlap_area += covered.area
+
+    return overlap_area, overlap_count
+
+
+# Estimates the cost of each HUC from the polygons whose extents overlap it, without clipping anything
+def estimate_huc_costs(polys_path, huc_geometries):
+    fids = list(huc_geometries)
+    huc_extents = [huc_geometries[fid].extent for fid in fids]
+    cell_size = sum(max(extent.width, extent.height) for extent in huc_extents) / len(huc_extents) or 1
+    grid_index = build_grid_index(huc_extents, cell_size)
+
+    # only read polygons inside the combined extent of the selected HUCs
+    work_extent = arcpy.Extent(min(extent.XMin for extent in huc_extents), min(extent.YMin for extent in huc_extents),
+                               max(extent.XMax for extent in huc_extents), max(extent.YMax for extent in huc_extents),
+                               spatial_reference=huc_extents[0].spatialReference)
+
+    counts = {fid: [0, 0] for fid in fids} # OBJECTID -> [polygons, vertices]
+    with arcpy.da.SearchCursor(polys_path, ["SHAPE@"], spatial_filter=work_extent.polygon) as cursor:
+        for row in cursor:
+            if row[0] is None:
+                continue
+            extent = row[0].extent
+
+            candidates = set()
+            for col in range(int(extent.XMin // cell_size), int(extent.XMax // cell_size) + 1):
+                for grid_row in range(int(extent.YMin // cell_size), int(extent.YMax // cell_size) + 1):
+                    candidates.update(grid_index.get((col, grid_row), []))
+
+            for i in candidates:
+                if extents_overlap(extent, huc_extents[i]):
+                    counts[fids[i]][0] += 1
+                    counts[fids[i]][1] += row[0].pointCount
+
+    return {fid: (polygons, vertices, HUC_BASE_COST + POLYGON_COST * polygons + VERTEX_COST * vertices)
+            for fid, (polygons, vertices) in counts.items()}
+
+
+# Predicts the relative run time of largest-first scheduling where each HUC goes to the first idle worker
+def predict_run_time(costs, workers):
+    loads = [0] * workers
+    for cost in sorted((estimate[2] for estimate in costs.values()), reverse=True):
+        heapq.heapreplace(loads, loads[0] + cost)
+
+    return max(loads)
+
+
+# Prints the estimated relative cost of each HUC and of the whole run without running the extraction
+def explain_plan(costs, workers):
+    arcpy.AddMessage("Extraction plan (largest first, relative cost, not seconds):")
+    for fid, (polygons, vertices, cost) in sorted(costs.items(), key=lambda item: item[1][2], reverse=True):
+        arcpy.AddMessage(f"    OBJECTID {fid}: {polygons} polygons, {vertices} vertices, cost {round(cost, 1)}")
+
+    single_cost = predict_run_time(costs, 1)
+    arcpy.AddMessage(f"Relative run cost with 1 worker: {round(single_cost, 1)}")
+    if workers > 1:
+        parallel_cost = predict_run_time(costs, workers)
+        arcpy.AddMessage(f"Relative run cost with {workers} workers: {round(parallel_cost, 1)} "
+                         f"(~{round(single_cost / parallel_cost, 1)}x faster)")
+
+
+# Clips the polygons to one HUC and returns the (count, acres, km) result with the messages to print
+def analyze_huc(working_feature_set, huc_geometry, overlap_aware):
+    messages = []
+    arcpy.SelectLayerByLocation_management(working_feature_set, "INTERSECT", huc_geometry, "", "NEW_SELECTION") # select polygons inside HUC for analysis
+    
+    clipped_features = 'in_memory\\clipped_features' # store clipped features in memory
+
+    # Use the Clip tool
+    arcpy.Clip_analysis(working_feature_set, huc_geometry, clipped_features)
+
+    polygon_count = arcpy.GetCount_management(clipped_features) # get polygon count
+
+    # Sum the area and length
+    total_area = 0
+    total_length = 0
+
+    with arcpy.da.SearchCursor(clipped_features, ["SHAPE@AREA", "SHAPE@LENGTH"]) as cursor: #get summation of area and length in the HUC
+        for row in cursor: 
+            total_area += row[0]
+            total_length += row[1]
+
+    if overlap_aware: # find polygons digitized on top of each other within the HUC
+        overlap_area, overlap_count = overlap_stats(clipped_features)
+        messages.append(f"Overlapping Pairs: {overlap_count}")
+        messages.append(f"Raw Area (acres): {round((total_area / 4046.85642), 2)}")
+        messages.append(f"Deduplicated Area (acres): {round(((total_area - overlap_area) / 4046.85642), 2)}")
+
+    total_area = round((total_area / 4046.85642), 2) # convert to acers and round
+    total_length = round((total_length / 1000), 2) # convert to km and round
+
+    #Print outputs as messages in the tool (optional):
+    messages.append(f'Count: {polygon_count}')
+    messages.append(f"Total Area (acres): {total_area}")
+    messages.append(f"Total Length (km): {total_length}")
+
+    arcpy.Delete_management(clipped_features) #delete clipped features from memory
+
+    return (int(str(polygon_count)), total_area, total_length), messages # weird shenanagins to convert from Result to int
+
+
+# Sets up a parallel worker process with its own feature layer and the cached HUC geometries
+def init_worker(polys_path, huc_path, fids, overlap_aware):
+    arcpy.MakeFeatureLayer_management(polys_path, "worker_set")
+    _worker_state["working_feature_set"] = "worker_set"
+    _worker_state["huc_geometries"] = load_huc_geometries(huc_path, fids) # memory-maps the cache written by the main process
+    _worker_state["overlap_aware"] = overlap_aware
+
+
+def analyze_huc_task(fid):
+    result, messages = analyze_huc(_worker_state["working_feature_set"], _worker_state["huc_geometries"][fid],
+                                   _worker_state["overlap_aware"])
+    return fid, result, messages
+
+
+# Runs the HUCs in the given order on a pool of worker processes, each idle worker takes the next (largest) HUC
+def run_parallel(ordered_fids, workers, polys_path, huc_path, overlap_aware):
+    if not sys.executable.lower().endswith("python.exe") and os.name == "nt": # inside ArcGIS Pro sys.executable is ArcGISPro.exe
+        multiprocessing.set_executable(os.path.join(sys.exec_prefix, "python.exe"))
+
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers, initializer=init_worker, initargs=(polys_path, huc_path, ordered_fids, overlap_aware)) as pool:
+        for fid, result, messages in pool.imap_unordered(analyze_huc_task, ordered_fids, chunksize=1):
+            yield fid, result, messages
+
+
+# Estimates the vertices inside a tile, assuming each HUC's vertices are spread evenly over that HUC's extent
+def estimate_tile_vertices(tile, huc_extents, costs):
+    xmin, ymin, xmax, ymax = tile
+    vertices = 0
+    for fid, extent in huc_extents.items():
+        overlap_width = min(xmax, extent.XMax) - max(xmin, extent.XMin)
+        overlap_height = min(ymax, extent.YMax) - max(ymin, extent.YMin)
+        if overlap_width <= 0 or overlap_height <= 0:
+            continue
+        huc_area = (extent.width * extent.height) or 1
+        vertices += costs[fid][1] * min(1, overlap_width * overlap_height / huc_area)
+
+    return vertices
+
+
+# Splits the combined extent of the HUCs into tiles (xmin, ymin, xmax, ymax) whose estimated vertices fit the memory
+# budget. Tiles over the budget are split into quarters, down to MAX_TILE_DEPTH, so dense clusters get smaller tiles.
+def plan_tiles(huc_geometries, costs, memory_mb):
+    huc_extents = {fid: geometry.extent for fid, geometry in huc_geometries.items()}
+    budget_vertices = memory_mb * 1024 * 1024 / BYTES_PER_VERTEX
+
+    pending = [(min(extent.XMin for extent in huc_extents.values()), min(extent.YMin for extent in huc_extents.values()),
+                max(extent.XMax for extent in huc_extents.values()), max(extent.YMax for extent in huc_extents.values()), 0)]
+    tiles = []
+    while pending:
+        xmin, ymin, xmax, ymax, depth = pending.pop()
+        if estimate_tile_vertices((xmin, ymin, xmax, ymax), huc_extents, costs) <= budget_vertices or depth >= MAX_TILE_DEPTH:
+            tiles.append((xmin, ymin, xmax, ymax))
+            continue
+
+        xmid = (xmin + xmax) / 2
+        ymid = (ymin + ymax) / 2
+        pending.extend([(xmin, ymin, xmid, ymid, depth + 1), (xmid, ymin, xmax, ymid, depth + 1),
+                        (xmin, ymid, xmid, ymax, depth + 1), (xmid, ymid, xmax, ymax, depth + 1)])
+
+    return tiles
+
+
+def tile_extent(tile, spatial_reference):
+    return arcpy.Extent(*tile, spatial_reference=spatial_reference)
+
+
+# Checks if a point is inside a tile. Tiles share their edges, so only the outer edges of the tiled area are inclusive.
+def tile_contains(tile, x, y, area):
+    return ((tile[0] <= x < tile[2] or x == tile[2] == area[2]) and
+            (tile[1] <= y < tile[3] or y == tile[3] == area[3]))
+
+
+# Sums the polygons owned by one tile for each HUC as {OBJECTID: [count, area, length]} in the units of the data
+def analyze_tile(polys_path, huc_geometries, tiles, index):
+    spatial_reference = next(iter(huc_geometries.values())).spatialReference
+    huc_extents = {fid: geometry.extent for fid, geometry in huc_geometries.items()}
+    tile = tiles[index]
+    area = (min(other[0] for other in tiles), min(other[1] for other in tiles),
+            max(other[2] for other in tiles), max(other[3] for other in tiles)) # the whole tiled area
+
+    partial = {}
+    # read every polygon whose extent touches the tile, any of them can be owned by it
+    with arcpy.da.SearchCursor(polys_path, ["SHAPE@"], spatial_filter=tile_extent(tile, spatial_reference).polygon,
+                               spatial_relationship="ENVELOPE_INTERSECTS") as cursor:
+        for poly_row in cursor:
+            polygon = poly_row[0]
+            if polygon is None:
+                continue
+
+            # a polygon crossing tiles is owned by the tile holding the lower-left corner of its extent, moved inside
+            # the tiled area, so it is counted exactly once
+            poly_extent = polygon.extent
+            if not tile_contains(tile, max(poly_extent.XMin, area[0]), max(poly_extent.YMin, area[1]), area):
+                continue
+
+            # intersect with every HUC the polygon reaches, not only the ones reaching this tile, the same as
+            # clipping the polygon to each HUC
+            for fid, huc_geometry in huc_geometries.items():
+                if not extents_overlap(poly_extent, huc_extents[fid]):
+                    continue
+                clipped = polygon.intersect(huc_geometry, 4)
+                if clipped.area > 0:
+                    totals = partial.setdefault(fid, [0, 0, 0])
+                    totals[0] += 1
+                    totals[1] += clipped.area
+                    totals[2] += clipped.length
+
+    return partial
+
+
+def init_tile_worker(polys_path, huc_path, fids, tiles):
+    _worker_state["polys_path"] = polys_path
+    _worker_state["huc_geometries"] = load_huc_geometries(huc_path, fids)
+    _worker_state["tiles"] = tiles
+
+
+def analyze_tile_task(index):
+    return analyze_tile(_worker_state["polys_path"], _worker_state["huc_geometries"], _worker_state["tiles"], index)
+
+
+# Processes every tile one after another or on a pool of workers, and merges the partial totals of HUCs shared by tiles
+def run_tiled(polys_path, huc_path, huc_geometries, tiles, workers):
+
+    if workers > 1:
+        if not sys.executable.lower().endswith("python.exe") and os.name == "nt": # inside ArcGIS Pro sys.executable is ArcGISPro.exe
+            multiprocessing.set_executable(os.path.join(sys.exec_prefix, "python.exe"))
+        context = multiprocessing.get_context("spawn")
+        pool = context.Pool(workers, initializer=init_tile_worker, initargs=(polys_path, huc_path, list(huc_geometries), tiles))
+        partials = pool.imap_unordered(analyze_tile_task, range(len(tiles)), chunksize=1)
+    else:
+        pool = None
+        partials = (analyze_tile(polys_path, huc_geometries, tiles, index) for index in range(len(tiles)))
+
+    merged = {fid: [0, 0, 0] for fid in huc_geometries}
+    try:
+        for partial in partials:
+            for fid, (count, area, length) in partial.items():
+                merged[fid][0] += count
+                merged[fid][1] += area
+                merged[fid][2] += length
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    for fid, (count, area, length) in merged.items():
+        result = (count, round((area / 4046.85642), 2), round((length / 1000), 2)) # convert to acres and km and round
+        yield fid, result, [f'Count: {result[0]}', f"Total Area (acres): {result[1]}", f"Total Length (km): {result[2]}"]
+
+
+# Writes the per-HUC results {OBJECTID: (count, acres, km)} to the HUC layer in a single cursor pass
+def write_huc_results(selecting_feature_class, results, huc_path, huc_mtime):
+    if not results:
+        return
+
+    before_write_mtime = dataset_mtime(huc_path)
+
+    fids = list(results)
+    for i in range(0, len(fids), 1000): # keep the IN list a reasonable size
+        query = f"\"OBJECTID\" IN ({','.join(str(fid) for fid in fids[i:i + 1000])})"
+        with arcpy.da.UpdateCursor(selecting_feature_class, ['OBJECTID', 'POLY_CT', 'POLY_AREA_ACRES', 'POLY_LENGTH_KM'], query) as cursor: # update fields in attribute table for HUCs
+            for row in cursor:
+                row[1], row[2], row[3] = results[row[0]]
+                cursor.updateRow(row)
+
+    restamp_cache(huc_path, huc_mtime, before_write_mtime) # only attributes changed, so keep the cached boundaries valid
+
+
+def script_tool(selecting_feature, polys_feature, simplify_tolerance=None, snap_grid=None, overlap_aware=False, persist=True,
+                workers=1, explain=False, tile_memory_mb=None):
     """Script code goes below"""
     # Get the directory for the polygons
     poly_path_split = polys_feature.split('\\') # split up path
@@ -10,6 +475,8 @@ def script_tool(selecting_feature, polys_feature):
     arcpy.env.workspace = database_path #set working directory
 
     if arcpy.Exists(feature_layer): # ensure feature class exists in database and create a feature layer to work with
+        if simplify_tolerance or snap_grid: # optional pre-pass to cut vertex counts before clipping
+            feature_layer = reduce_polygons(feature_layer, snap_grid, simplify_tolerance)
         working_feature_set = "working_set"
         arcpy.MakeFeatureLayer_management(feature_layer, working_feature_set)
     else:
@@ -25,53 +492,73 @@ def script_tool(selecting_feature, polys_feature):
     
     selected_ids = [int(fid) for fid in desc.FIDSet.split(';')] #split out each object ID for the HUCS
 
-    for fid in selected_ids: #analyze each HUC
-        query = f"\"OBJECTID\" = {fid}"
-        arcpy.AddMessage(query)
-        select_lyr = arcpy.MakeFeatureLayer_management(selecting_feature_class, "in_memory\\selected_features_lyr", query) # create a layer of the currently selected HUC in memory
-        arcpy.SelectLayerByLocation_management(working_feature_set, "INTERSECT", select_lyr, "", "NEW_SELECTION") # select polygons inside HUC for analysis
-        
-        clipped_features = 'in_memory\\clipped_features' # store clipped features in memory
+    # load the selected HUC boundaries once from the session/disk cache instead of building a layer for each HUC
+    huc_path = desc.catalogPath
+    huc_mtime = dataset_mtime(huc_path)
+    huc_geometries = load_huc_geometries(huc_path, selected_ids)
 
-        # Use the Clip tool
-        arcpy.Clip_analysis(working_feature_set, select_lyr, clipped_features)
+    # OBJECTID -> (count, acres, km), returned so the results can be used without reading the layer again.
+    # HUCs without a shape have nothing to clip and are reported as 0.
+    results = {fid: (0, 0, 0) for fid in selected_ids if fid not in huc_geometries}
+    if results:
+        arcpy.AddWarning(f"HUCs with no shape are reported as 0: OBJECTID {', '.join(str(fid) for fid in results)}")
+        selected_ids = [fid for fid in selected_ids if fid in huc_geometries]
+        if not selected_ids and explain: # nothing to plan
+            return
 
-        arcpy.Delete_management(select_lyr) # delete selected polys from memory
+    ordered_fids = selected_ids
+    if selected_ids and (workers > 1 or explain or tile_memory_mb): # plan the run so the most expensive HUCs start first
+        polys_path = arcpy.Describe(feature_layer).catalogPath
+        costs = estimate_huc_costs(polys_path, huc_geometries)
+        ordered_fids = sorted(selected_ids, key=lambda fid: costs[fid][2], reverse=True)
 
-        polygon_count = arcpy.GetCount_management(clipped_features) # get polygon count
+        if tile_memory_mb: # split the work into tiles that fit the memory budget
+            tiles = plan_tiles(huc_geometries, costs, tile_memory_mb)
+            arcpy.AddMessage(f"Processing in {len(tiles)} tiles of {tile_memory_mb} MB")
+            if overlap_aware:
+                arcpy.AddWarning("Overlap-aware area totals are not available in tiled mode and will not be reported.")
 
-        # Sum the area and length
-        total_area = 0
-        total_length = 0
+        if explain: # dry run, only report the plan
+            explain_plan(costs, workers)
+            return
 
-        with arcpy.da.SearchCursor(clipped_features, ["SHAPE@AREA", "SHAPE@LENGTH"]) as cursor: #get summation of area and length in the HUC
-            for row in cursor: 
-                total_area += row[0]
-                total_length += row[1]
-
-        total_area = round((total_area / 4046.85642), 2) # convert to acers and round
-        total_length = round((total_length / 1000), 2) # convert to km and round
+    if not selected_ids: # only HUCs without a shape were selected
+        huc_results = ()
+    elif tile_memory_mb:
+        huc_results = run_tiled(polys_path, huc_path, huc_geometries, tiles, workers)
+    elif workers > 1:
+        huc_results = run_parallel(ordered_fids, workers, polys_path, huc_path, overlap_aware)
+    else:
+        huc_results = ((fid, *analyze_huc(working_feature_set, huc_geometries[fid], overlap_aware)) for fid in ordered_fids)
 
-        #Print outputs as messages in the tool (optional):
-        arcpy.AddMessage(f'Count: {polygon_count}')
-        arcpy.AddMessage(f"Total Area (acres): {total_area}")
-        arcpy.AddMessage(f"Total Length (km): {total_length}")
+    for fid, result, messages in huc_results: #analyze each HUC
+        arcpy.AddMessage(f"\"OBJECTID\" = {fid}")
+        for message in messages:
+            arcpy.AddMessage(message)
+        results[fid] = result
 
-        arcpy.Delete_management(clipped_features) #delete clipped features from memory
+    if not persist: # the caller uses the results first and saves them to the layer afterwards
+        return results, lambda: write_huc_results(selecting_feature_class, results, huc_path, huc_mtime)
 
-        with arcpy.da.UpdateCursor(selecting_feature_class, ['OBJECTID', 'POLY_CT', 'POLY_AREA_ACRES', 'POLY_LENGTH_KM'], query) as cursor: # update fields in attribute table for HUCs
-            for row in cursor:
-                row[1] = int(str(polygon_count)) # weird shenanagins to convert from Result to int
-                row[2] = total_area
-                row[3] = total_length
-                cursor.updateRow(row)
-                break
-    return
+    write_huc_results(selecting_feature_class, results, huc_path, huc_mtime)
+    return results, None
 
 
 if __name__ == "__main__":
     # get params
     selecting_feature = arcpy.GetParameterAsText(0)
     polys_feature = arcpy.GetParameterAsText(1)
+    simplify_tolerance = arcpy.GetParameterAsText(2) # optional, in the units of the polygon feature class
+    snap_grid = arcpy.GetParameterAsText(3) # optional, in the units of the polygon feature class
+    overlap_aware = arcpy.GetParameterAsText(4) # optional, report area with overlapping polygons counted once
+    workers = arcpy.GetParameterAsText(5) # optional, number of worker processes
+    explain = arcpy.GetParameterAsText(6) # optional, only report the plan and predicted run time
+    tile_memory_mb = arcpy.GetParameterAsText(7) # optional, process in spatial tiles that fit this memory budget
 
-    script_tool(selecting_feature, polys_feature)
\ No newline at end of file
+    script_tool(selecting_feature, polys_feature,
+                float(simplify_tolerance) if simplify_tolerance else None,
+                float(snap_grid) if snap_grid else None,
+                overlap_aware.lower() == "true",
+                workers=int(workers) if workers else 1,
+                explain=explain.lower() == "true",
+                tile_memory_mb=float(tile_memory_mb) if tile_memory_mb else None)
\ No newline at end of file
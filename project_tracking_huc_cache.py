@@ -0,0 +1,143 @@
+"""
+Session cache of HUC boundary geometries with on-disk WKB persistence.
+
+HUC boundaries are static reference data, so the selected geometries are read
+from the geodatabase once, kept in memory for the rest of the ArcGIS Pro
+session and saved as WKB keyed by the HUC dataset path and modification time.
+Later runs and parallel workers memory-map the file instead of querying the
+geodatabase again.
+"""
+import arcpy
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+CACHE_FOLDER = os.path.join(tempfile.gettempdir(), "ProjectTrackingCache") # where the WKB files are stored
+
+_session_cache = {} # cache file path -> {OBJECTID: geometry} for the current session
+
+
+# Returns the modification time of a dataset. For file geodatabases the newest of the dataset's own files
+# (a<DSID in hex>.gdbtable, .gdbtablx, .spx and indexes) is used, so edits to other datasets do not count.
+def dataset_mtime(dataset_path):
+    if os.path.isfile(dataset_path):
+        return os.path.getmtime(dataset_path)
+
+    gdb_path = dataset_path
+    while gdb_path and not gdb_path.lower().endswith(".gdb"):
+        parent = os.path.dirname(gdb_path)
+        if parent == gdb_path:
+            return None
+        gdb_path = parent
+
+    if not os.path.isdir(gdb_path):
+        return None # enterprise geodatabases and services are not cached on disk
+
+    try:
+        file_prefix = f"a{arcpy.Describe(dataset_path).DSID:08x}."
+    except Exception:
+        return None
+
+    mtimes = [entry.stat().st_mtime for entry in os.scandir(gdb_path) if entry.is_file() and entry.name.lower().startswith(file_prefix)]
+    return max(mtimes) if mtimes else None # files not found, do not cache rather than guess
+
+
+# Builds the cache file path for a dataset from its path and modification time
+def cache_file_path(dataset_path, mtime):
+    key = hashlib.sha1(f"{os.path.abspath(dataset_path).lower()}|{mtime}".encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_FOLDER, f"huc_{key}.wkb")
+
+
+# Reads the geometries stored in a cache file by memory-mapping it
+def read_cache_file(path):
+    with open(path, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            header_length = struct.unpack("<Q", mapped[:8])[0]
+            header = json.loads(mapped[8:8 + header_length].decode("utf-8"))
+            data_start = 8 + header_length
+
+            spatial_reference = arcpy.SpatialReference()
+            spatial_reference.loadFromString(header["spatial_reference"])
+
+            geometries = {}
+            for oid, (offset, length) in header["geometries"].items():
+                wkb = bytes(mapped[data_start + offset:data_start + offset + length])
+                geometries[int(oid)] = arcpy.FromWKB(wkb, spatial_reference)
+
+    return geometries
+
+
+# Writes geometries to a cache file as a json index followed by the WKB of each geometry
+def write_cache_file(path, geometries):
+    offsets = {}
+    blobs = []
+    position = 0
+    spatial_reference = None
+    for oid, geometry in geometries.items():
+        wkb = bytes(geometry.WKB)
+        offsets[str(oid)] = [position, len(wkb)]
+        blobs.append(wkb)
+        position += len(wkb)
+        spatial_reference = geometry.spatialReference
+
+    if spatial_reference is None: # nothing to save, an empty file could not be read back
+        return
+
+    header = json.dumps({"spatial_reference": spatial_reference.exportToString(),
+                         "geometries": offsets}).encode("utf-8")
+
+    os.makedirs(CACHE_FOLDER, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(struct.pack("<Q", len(header)))
+        file.write(header)
+        for blob in blobs:
+            file.write(blob)
+    os.replace(temp_path, path) # swap in the finished file so workers never map a partial write
+
+
+# Returns {OBJECTID: geometry} for the requested HUCs, only querying the geodatabase for ones not cached yet
+def load_huc_geometries(huc_path, fids):
+    mtime = dataset_mtime(huc_path)
+    path = cache_file_path(huc_path, mtime) if mtime is not None else None
+
+    geometries = _session_cache.get(path)
+    if geometries is None:
+        geometries = read_cache_file(path) if path and os.path.exists(path) else {}
+
+    missing = [fid for fid in fids if fid not in geometries]
+    if missing:
+        oid_field = arcpy.Describe(huc_path).OIDFieldName
+        for i in range(0, len(missing), 1000): # keep the IN list a reasonable size
+            query = f"{oid_field} IN ({','.join(str(fid) for fid in missing[i:i + 1000])})"
+            with arcpy.da.SearchCursor(huc_path, ["OID@", "SHAPE@"], query) as cursor:
+                for row in cursor:
+                    if row[1] is not None: # HUCs without a shape are skipped
+                        geometries[row[0]] = row[1]
+
+        if path and geometries:
+            write_cache_file(path, geometries)
+
+    if path:
+        _session_cache[path] = geometries
+
+    return {fid: geometries[fid] for fid in fids if fid in geometries}
+
+
+# Moves the cache to the dataset's new modification time after this tool only changed attribute values.
+# before_write_mtime is the modification time just before the tool's write, the cache is only moved when it still
+# matches the time the cache was loaded with, so edits made by anyone else during the run invalidate the cache.
+def restamp_cache(huc_path, old_mtime, before_write_mtime):
+    new_mtime = dataset_mtime(huc_path)
+    if old_mtime is None or new_mtime is None or new_mtime == old_mtime or before_write_mtime != old_mtime:
+        return
+
+    old_path = cache_file_path(huc_path, old_mtime)
+    new_path = cache_file_path(huc_path, new_mtime)
+    if os.path.exists(old_path):
+        os.replace(old_path, new_path)
+    if old_path in _session_cache:
+        _session_cache[new_path] = _session_cache.pop(old_path)
@@ -0,0 +1,45 @@
+"""
+Script documentation
+
+- Tool parameters are accessed using arcpy.GetParameter() or
+                                     arcpy.GetParameterAsText()
+- Update derived parameter values using arcpy.SetParameter() or
+                                        arcpy.SetParameterAsText()
+"""
+import arcpy
+import project_tracking_data_update
+import project_tracking_extract_HUC_data
+
+
+def script_tool(checkout_layer, polys_feature, simplify_tolerance=None, snap_grid=None):
+    """Extracts the selected HUCs and updates the online tracking tables in one run"""
+    # Extract the polygon stats, saving them to the layer is left until the stats have been aggregated
+    extracted = project_tracking_extract_HUC_data.script_tool(checkout_layer, polys_feature, simplify_tolerance, snap_grid,
+                                                              persist=False)
+    if extracted is None: # the extract tool already reported the error
+        return
+
+    huc_results, save_results = extracted
+
+    # Aggregate editor and team stats from the in memory results and publish them
+    project_tracking_data_update.script_tool(checkout_layer, huc_results)
+
+    # Save the stats to the layer once its cursors are closed, arcpy and geodatabase locks do not allow overlapping them
+    try:
+        save_results()
+    except Exception as e:
+        arcpy.AddError(f"Failed to save the HUC polygon stats to the Checkout Layer.\n\n{e}")
+
+    return
+
+
+if __name__ == "__main__":
+    # get params
+    checkout_layer = arcpy.GetParameterAsText(0)
+    polys_feature = arcpy.GetParameterAsText(1)
+    simplify_tolerance = arcpy.GetParameterAsText(2) # optional, in the units of the polygon feature class
+    snap_grid = arcpy.GetParameterAsText(3) # optional, in the units of the polygon feature class
+
+    script_tool(checkout_layer, polys_feature,
+                float(simplify_tolerance) if simplify_tolerance else None,
+                float(snap_grid) if snap_grid else None)
@@ -0,0 +1,147 @@
+"""
+Mergeable quantile sketches used for the editor and team timing distributions.
+
+The sketch is a KLL sketch: it keeps a fixed number of items no matter how many
+values are added, and sketches built from different projects can be merged
+without rescanning the Checkout tables. Every data update run sketches the
+whole Checkout table, so a saved file is a snapshot of its project and two
+files of the same project must not be merged.
+"""
+import json
+import math
+import random
+
+SKETCH_K = 200 # larger values use more memory and give more accurate quantiles
+SKETCH_SEED = 0 # fixed so identical runs publish identical quantiles
+
+
+# Holds a KLL sketch for a single timing measurement
+class QuantileSketch:
+    def __init__(self, k=SKETCH_K, seed=SKETCH_SEED):
+        self.k = k
+        self.count = 0
+        self.compactors = [[]]
+        self._random = random.Random(seed)
+
+    # capacity of a compactor level, higher levels hold more heavily weighted items
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil((2 / 3) ** depth * self.k)) + 1
+
+    def _size(self):
+        return sum(len(compactor) for compactor in self.compactors)
+
+    def _max_size(self):
+        return sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    # halves the first full compactor by promoting every other sorted item to the next level
+    def _compress(self):
+        for level in range(len(self.compactors)):
+            compactor = self.compactors[level]
+            if len(compactor) < self._capacity(level):
+                continue
+
+            if level + 1 >= len(self.compactors):
+                self.compactors.append([])
+
+            compactor.sort()
+            leftover = compactor.pop() if len(compactor) % 2 else None
+            offset = self._random.randint(0, 1)
+            self.compactors[level + 1].extend(compactor[offset::2])
+            compactor.clear()
+            if leftover is not None:
+                compactor.append(leftover)
+
+            if self._size() < self._max_size():
+                break
+
+    def update(self, value):
+        self.compactors[0].append(float(value))
+        self.count += 1
+        if self._size() >= self._max_size():
+            self._compress()
+
+    # adds the values of another sketch to this one
+    def merge(self, other):
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, compactor in enumerate(other.compactors):
+            self.compactors[level].extend(compactor)
+        self.count += other.count
+
+        while self._size() >= self._max_size():
+            self._compress()
+
+        return self
+
+    # returns the value at quantile q (0 - 1), or None if the sketch is empty
+    def quantile(self, q):
+        weighted = sorted((value, 2 ** level) for level, compactor in enumerate(self.compactors) for value in compactor)
+        if not weighted:
+            return None
+
+        total_weight = sum(weight for _, weight in weighted)
+        cumulative = 0
+        for value, weight in weighted:
+            cumulative += weight
+            if cumulative >= q * total_weight:
+                return value
+
+        return weighted[-1][0]
+
+    def to_dict(self):
+        return {"k": self.k, "count": self.count, "compactors": self.compactors}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(k=data["k"])
+        sketch.count = data["count"]
+        sketch.compactors = [list(compactor) for compactor in data["compactors"]]
+        return sketch
+
+
+# Returns the median, p90 and p99 of a sketch rounded for the tracking tables (0 when there are no values)
+def summarize(sketch):
+    return [round(sketch.quantile(q), 2) if sketch.count else 0 for q in (0.5, 0.9, 0.99)]
+
+
+# Writes a nested dictionary of sketches ({group: {name: {key: sketch}}}) to a json file
+def save_sketches(path, sketches):
+    data = {group: {name: {key: sketch.to_dict() for key, sketch in by_key.items()}
+                    for name, by_key in by_name.items()}
+            for group, by_name in sketches.items()}
+
+    with open(path, mode='w') as file:
+        json.dump(data, file)
+
+
+def load_sketches(path):
+    with open(path) as file:
+        data = json.load(file)
+
+    return {group: {name: {key: QuantileSketch.from_dict(sketch) for key, sketch in by_key.items()}
+                    for name, by_key in by_name.items()}
+            for group, by_name in data.items()}
+
+
+# Merges a nested dictionary of sketches into another, sketches missing from target are added to it
+def merge_sketch_sets(target, source):
+    for group, by_name in source.items():
+        for name, by_key in by_name.items():
+            for key, sketch in by_key.items():
+                merged = target.setdefault(group, {}).setdefault(name, {})
+                if key in merged:
+                    merged[key].merge(sketch)
+                else:
+                    merged[key] = QuantileSketch().merge(sketch)
+
+    return target
+
+
+# Merges sketch files of several projects into a single set of sketches
+def merge_sketch_files(paths):
+    merged = {}
+    for path in paths:
+        merge_sketch_sets(merged, load_sketches(path))
+
+    return merged
@@ -0,0 +1,56 @@
+"""
+Portal sessions shared by the project tracking tools.
+
+ArcGIS Pro runs script tools in the same Python process, so signed in GIS
+objects are kept for the rest of the session and reused by every tool run and
+by every project of a batch. Reusing the GIS object also reuses its HTTP
+connections, and the API renews its token when it expires. Portals signed in
+to with a username and password are saved as an ArcGIS API profile, which
+keeps the password in the operating system's credential store (Windows
+Credential Manager), so a new session can sign in from the profile.
+"""
+import arcpy
+import hashlib
+import threading
+from arcgis.gis import GIS
+
+_sessions = {} # (portal url, username) -> (GIS, Pro sign in token the GIS was created with)
+_lock = threading.Lock()
+
+
+# Profile name for a portal and user, hashed so any url can be used in the name
+def _profile_name(url, username):
+    return f"project_tracking_{hashlib.sha1(f'{url.lower()}|{username}'.encode('utf-8')).hexdigest()[:16]}"
+
+
+# Signs in with a username and password, using the saved profile when it still works
+def _sign_in(url, username, password):
+    profile = _profile_name(url, username)
+    try:
+        return GIS(profile=profile)
+    except Exception:
+        pass # no profile yet or its password changed, sign in and save it again
+
+    return GIS(url, username, password, profile=profile)
+
+
+# Returns a signed in GIS, reusing the one from an earlier run or another thread.
+# Without a username the active portal of ArcGIS Pro is used. Its session is kept per portal and only reused while
+# Pro's sign in token is unchanged, so switching the active portal, signing in as another user or Pro renewing an
+# expired token all give a new GIS.
+def get_gis(url="Pro", username=None, password=None):
+    if url == "Pro":
+        key = (arcpy.GetActivePortalURL(), None)
+        signin_token = (arcpy.GetSigninToken() or {}).get("token")
+    else:
+        key = (url, username)
+        signin_token = None
+
+    with _lock:
+        cached = _sessions.get(key)
+        if cached and cached[1] == signin_token:
+            return cached[0]
+
+        gis = _sign_in(url, username, password) if username else GIS(url)
+        _sessions[key] = (gis, signin_token)
+        return gis
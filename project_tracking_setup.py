@@ -8,22 +8,17 @@ Script documentation
 """
 # Import packages
 import arcpy
-from arcgis.gis import GIS
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from arcgis.features import FeatureLayerCollection
+from project_tracking_session import get_gis
+from project_tracking_template_cache import create_from_template, get_template
 
-def script_tool(checkout_lyr):
-    """Script code goes below"""
-    
-    # Authenticate API using Pro license
-    target_gis = GIS("Pro")
+MAX_PARALLEL_PROJECTS = 4 # default number of projects provisioned at the same time in batch mode
 
-    with arcpy.da.SearchCursor(checkout_lyr, 'TeamTMU') as cursor:
-        for row in cursor:
-            team_tmu = row[0]
-            break
-    
-    project = team_tmu.strip()
 
+# Builds the table definitions for the four tracking tables of a project
+def build_table_properties(project):
     ######### DEFINE TABLE FIELDS AND PROPERTIES #######
     # Create list of fields for Editor Tracking Table
     fields_ett = [{
@@ -107,6 +102,33 @@ def script_tool(checkout_lyr):
             "nullable": False,
             "editable": True,
             "domain": None,
+            "defaultValue": None},
+        {
+            "name": "Median_Map_Hrs",
+            "type": "esriFieldTypeDouble",
+            "alias": "Median_Map_Hrs",
+            "sqlType": "sqlTypeOther",
+            "nullable": True,
+            "editable": True,
+            "domain": None,
+            "defaultValue": None},
+        {
+            "name": "P90_Map_Hrs",
+            "type": "esriFieldTypeDouble",
+            "alias": "P90_Map_Hrs",
+            "sqlType": "sqlTypeOther",
+            "nullable": True,
+            "editable": True,
+            "domain": None,
+            "defaultValue": None},
+        {
+            "name": "P99_Map_Hrs",
+            "type": "esriFieldTypeDouble",
+            "alias": "P99_Map_Hrs",
+            "sqlType": "sqlTypeOther",
+            "nullable": True,
+            "editable": True,
+            "domain": None,
             "defaultValue": None}
     ]
 
@@ -420,6 +442,114 @@ def script_tool(checkout_lyr):
             "editable": True,
             "domain": None,
             "defaultValue": None},
+        {
+            "name": "Median_Map_Time",
+            "type": "esriFieldTypeDouble",
+            "alias": "Median_Map_Time",
+            "sqlType": "sqlTypeOther",
+            "nullable": True,
+            "editable": True,
+            "domain": None,
+            "defaultValue": None},
+        {
+            "name": "P90_Map_Time",
+            "type": "esriFieldTypeDouble",
+            "alias": "P90_Map_Time",
+            "sqlType": "sqlTypeOther",
+            "nullable": True,
+            "editable": True,
+            "domain": None,
+            "defaultValue": None},
+        {
+            "name": "P99_Map_Time",
+            "type": "esriFieldTypeDouble",
+            "alias": "P99_Map_Time",
+            "sqlType": "sqlTypeOther",
+            "nullable": True,
+            "editable": True,
+            "domain": None,
+            "defaultValue": None},
+        {
+            "name": "Median_QA_Time",
+            "type": "esriFieldTypeDouble",
+            "alias": "Median_QA_Time",
+            "sqlType": "sqlTypeOther",
+            "nullable": True,
+            "editable": True,
+            "domain": None,
+            "defaultValue": None},
+        {
+            "name": "P90_QA_Time",
+            "type": "esriFieldTypeDouble",
+            "alias": "P90_QA_Time",
+            "sqlType": "sqlTypeOther",
+            "nullable": True,
+            "editable": True,
+            "domain": None,
+            "defaultValue": None},
+        {
+            "name": "P99_QA_Time",
+            "type": "esriFieldTypeDouble",
+            "alias": "P99_QA_Time",
+            "sqlType": "sqlTypeOther",
+            "nullable": True,
+            "editable": True,
+            "domain": None,
+            "defaultValue": None},
+        {
+            "name": "Median_Finalize_Time",
+            "type": "esriFieldTypeDouble",
+            "alias": "Median_Finalize_Time",
+            "sqlType": "sqlTypeOther",
+            "nullable": True,
+            "editable": True,
+            "domain": None,
+            "defaultValue": None},
+        {
+            "name": "P90_Finalize_Time",
+            "type": "esriFieldTypeDouble",
+            "alias": "P90_Finalize_Time",
+            "sqlType": "sqlTypeOther",
+            "nullable": True,
+            "editable": True,
+            "domain": None,
+            "defaultValue": None},
+        {
+            "name": "P99_Finalize_Time",
+            "type": "esriFieldTypeDouble",
+            "alias": "P99_Finalize_Time",
+            "sqlType": "sqlTypeOther",
+            "nullable": True,
+            "editable": True,
+            "domain": None,
+            "defaultValue": None},
+        {
+            "name": "Median_Total_Time",
+            "type": "esriFieldTypeDouble",
+            "alias": "Median_Total_Time",
+            "sqlType": "sqlTypeOther",
+            "nullable": True,
+            "editable": True,
+            "domain": None,
+            "defaultValue": None},
+        {
+            "name": "P90_Total_Time",
+            "type": "esriFieldTypeDouble",
+            "alias": "P90_Total_Time",
+            "sqlType": "sqlTypeOther",
+            "nullable": True,
+            "editable": True,
+            "domain": None,
+            "defaultValue": None},
+        {
+            "name": "P99_Total_Time",
+            "type": "esriFieldTypeDouble",
+            "alias": "P99_Total_Time",
+            "sqlType": "sqlTypeOther",
+            "nullable": True,
+            "editable": True,
+            "domain": None,
+            "defaultValue": None},
     ]
 
     #Define Project Tracking Table properties
@@ -435,6 +565,40 @@ def script_tool(checkout_lyr):
                                                                                                     "Team field to support append"}]
     }
 
+    return [properties_ett, properties_tet, properties_ttt, properties_ptt]
+
+
+# Runs one provisioning step, skipping it when exists_fn finds it already done, and records how long it took
+def run_step(timings, step_name, exists_fn, step_fn, error_message):
+    start = time.perf_counter()
+    try:
+        result = exists_fn()
+        status = "skipped"
+        if not result:
+            result = step_fn()
+            status = "done"
+    except Exception as e:
+        raise RuntimeError(f"{error_message} ({e})")
+    timings.append((step_name, status, round(time.perf_counter() - start, 2)))
+    return result
+
+
+# Returns the signed in user's item with this exact title and type from the given folders (None is the root folder).
+# Folders are listed directly because the search index lags behind items that were just created.
+def find_folder_item(target_gis, title, item_type, folders):
+    for folder in folders:
+        if folder is not None and not target_gis.content.folders.get(folder=folder):
+            continue
+        for item in target_gis.users.me.items(folder=folder, max_items=10000):
+            if item.title == title and item.type == item_type:
+                return item
+    return None
+
+
+# Provisions the tracking service, folder and Experience for one project. Steps that already exist are skipped.
+def provision_project(target_gis, project, template):
+    timings = []
+    table_properties = build_table_properties(project)
 
     ###### CREATING SERVICE LAYER TO HOST TABLES ######
 
@@ -451,65 +615,149 @@ def script_tool(checkout_lyr):
         "spatialReference": None
     }
 
-    #Create the empty feature service
-    try:
-        # Create the empty feature service
-        service_item = target_gis.content.create_service(name=service_name, service_type='featureService', create_params=service_params)
+    folder_name = f"{project}_Tracking"
 
-        # Access feature service
+    # Finds the service of an earlier run, in the root folder before it is moved or in the project folder after
+    def existing_service():
+        if target_gis.content.is_service_name_available(service_name, "featureService"):
+            return None
+        item = find_folder_item(target_gis, service_name, "Feature Service", [None, folder_name])
+        if item is None:
+            raise RuntimeError(f"The service name {service_name} is already used by another item or user")
+        return item
+
+    # Create the empty feature service
+    service_item = run_step(timings, "Create service", existing_service,
+                            lambda: target_gis.content.create_service(name=service_name, service_type='featureService', create_params=service_params),
+                            'Failed to create Online Service Layer. Ivalid Credentials. Ensure ArcGIS online portal is signed in and set to primary.')
+
+    # Add tables to service that are not defined yet
+    service_collection = None
+    tables_to_add = []
+
+    def tables_present():
+        nonlocal service_collection
         service_collection = FeatureLayerCollection.fromitem(service_item)
+        existing_tables = [table.properties.name for table in service_collection.tables]
+        tables_to_add.extend(properties for properties in table_properties if properties["name"] not in existing_tables)
+        return not tables_to_add
 
-        # Add tables to service
-        add_tables = service_collection.manager.add_to_definition({"tables": [properties_ett, properties_tet, properties_ttt, properties_ptt]})
-    except Exception as e:
-        arcpy.AddError('Failed to create Online Service Layer. Ivalid Credentials or Service Layer already exists. Ensure ArcGIS online portal is signed in and set to primary and ensure web portal does not already contain the Service Layer.')
-        return
-    
-    try:
-        # Create new folder for tracking items
-        folder_name = f"{project}_Tracking"
-        target_gis.content.folders.create(folder=folder_name)
+    run_step(timings, "Add tables", tables_present,
+             lambda: service_collection.manager.add_to_definition({"tables": tables_to_add}),
+             'Failed to add tracking tables to the Online Service Layer.')
 
-        # Move fs to folder
-        service_item.move(folder=folder_name)
-    except Exception as e:
-        arcpy.AddError(f'Error creating folder {folder_name} in ArcGIS Online. Ensure this folder does not already exist.')
-        return
-    
-    arcpy.AddMessage(str(folder_name))
-    
-    #Clone and rename Experience
-    try:
-        source_gis = GIS("https://smumn.maps.arcgis.com/home/index.html", "GSS_Workspace", "GSSWorkspaceAccount#666!")
+    # Add fields that were added to the table definitions after the service was created, ex. the quantile columns
+    fields_to_add = []
 
-        eb_id = "554d527ed8f341168c1f9466a83748e3"
+    def fields_present():
+        service_collection = FeatureLayerCollection.fromitem(service_item)
+        for table in service_collection.tables:
+            properties = next((properties for properties in table_properties if properties["name"] == table.properties.name), None)
+            if properties is None:
+                continue
+            existing_fields = [field["name"].lower() for field in table.properties.fields]
+            new_fields = [field for field in properties["fields"] if field["name"].lower() not in existing_fields]
+            if new_fields:
+                fields_to_add.append((table, new_fields))
+        return not fields_to_add
 
-        tracking_item = source_gis.content.get(eb_id)
+    def add_fields():
+        for table, new_fields in fields_to_add:
+            table.manager.add_to_definition({"fields": new_fields})
+        return True
 
-        item_mapping = {
-            "a8ef3a6e9e24455780fa5bac194f806b" : service_item.id
-        }
+    run_step(timings, "Add fields", fields_present, add_fields,
+             'Failed to add new tracking fields to the existing tables of the Online Service Layer.')
 
-        cloned_eb = target_gis.content.clone_items(items=[tracking_item], search_existing_items=False, item_mapping=item_mapping, folder=folder_name)
-    except Exception as e:
-        arcpy.AddError('Error cloning the Web Experience to new project.')
-        return
+    # Create new folder for tracking items
+    folder = run_step(timings, "Create folder",
+                      lambda: target_gis.content.folders.get(folder=folder_name),
+                      lambda: target_gis.content.folders.create(folder=folder_name),
+                      f'Error creating folder {folder_name} in ArcGIS Online.')
+
+    # Move fs to folder
+    run_step(timings, "Move service", lambda: service_item.ownerFolder == folder.properties.get("id"),
+             lambda: service_item.move(folder=folder_name),
+             f'Error moving {service_name} to folder {folder_name} in ArcGIS Online.')
+
+    # Clone and rename Experience
+    eb_title = f"{project}_Tracking_EB"
+    existing_eb = find_folder_item(target_gis, eb_title, "Web Experience", [folder_name])
+
+    item_mapping = {
+        "a8ef3a6e9e24455780fa5bac194f806b" : service_item.id
+    }
+
+    cloned_eb = run_step(timings, "Clone experience", lambda: [existing_eb] if existing_eb else None,
+                         lambda: [create_from_template(target_gis, template, item_mapping, eb_title, folder_name)],
+                         'Error cloning the Web Experience to new project.')
+
+    properties_dict = {
+        "title" : eb_title
+    }
+
+    run_step(timings, "Rename experience", lambda: cloned_eb[0].title == eb_title,
+             lambda: cloned_eb[0].update(item_properties=properties_dict),
+             'Error renaming web experience.')
+
+    return timings
+
+
+# Reads the project name from the TeamTMU field of a checkout layer
+def get_project_name(checkout_lyr):
+    with arcpy.da.SearchCursor(checkout_lyr, 'TeamTMU') as cursor:
+        for row in cursor:
+            team_tmu = row[0]
+            break
+
+    return team_tmu.strip()
+
+
+def script_tool(checkout_lyrs, max_workers=MAX_PARALLEL_PROJECTS):
+    """Script code goes below"""
     
+    # Authenticate API using Pro license, reusing the session from earlier runs
+    target_gis = get_gis("Pro")
+
+    # Multiple checkout layers can be passed separated by ; to provision a batch of projects
+    projects = []
+    for checkout_lyr in checkout_lyrs.split(";"):
+        checkout_lyr = checkout_lyr.strip().strip("'")
+        if checkout_lyr:
+            project = get_project_name(checkout_lyr)
+            if project not in projects: # layers of the same project would race to create the same items
+                projects.append(project)
+
+    # Get the template Experience once for every project in the batch, the source portal is only used when the local copy is stale
     try:
-        properties_dict = {
-            "title" : f"{project}_Tracking_EB"
-        }
+        eb_id = "554d527ed8f341168c1f9466a83748e3"
 
-        cloned_eb[0].update(item_properties=properties_dict)
+        template = get_template(lambda: get_gis("https://smumn.maps.arcgis.com/home/index.html", "GSS_Workspace", "GSSWorkspaceAccount#666!"), eb_id)
     except Exception as e:
-        arcpy.AddError('Error renaming web experience.')
+        arcpy.AddError('Error retrieving the Web Experience template.')
         return
 
+    # Provision projects concurrently, each project's steps still run in order
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(projects)))) as executor:
+        futures = {executor.submit(provision_project, target_gis, project, template): project for project in projects}
+        for future in as_completed(futures):
+            project = futures[future]
+            try:
+                timings = future.result()
+            except Exception as e:
+                arcpy.AddError(f'{project}: {e}')
+                continue
+
+            arcpy.AddMessage(f"{project}_Tracking")
+            for step_name, status, seconds in timings:
+                arcpy.AddMessage(f"    {step_name}: {status} in {seconds}s")
+
     return
 
 
 if __name__ == "__main__":
 
-    checkout_lyr = arcpy.GetParameterAsText(0)
+    checkout_lyrs = arcpy.GetParameterAsText(0) # one or more checkout layers separated by ;
+    max_workers = arcpy.GetParameterAsText(1) # optional, number of projects provisioned at the same time
 
-    script_tool(checkout_lyr)
\ No newline at end of file
+    script_tool(checkout_lyrs, int(max_workers) if max_workers else MAX_PARALLEL_PROJECTS)
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""
+Local, versioned cache of the Experience Builder template used by the setup tool.
+
+The template item's properties, data and resources are saved to disk under the
+item's modified time. The source portal is only contacted when the cache is
+older than TEMPLATE_MAX_AGE_HOURS, and new Experiences are created from the
+cached copy with the data source IDs and the source portal's URL rewritten
+locally instead of using clone_items.
+"""
+import json
+import os
+import shutil
+import time
+from urllib.parse import urlparse
+
+# per-user folder the OS does not clear, so the cached template is still there when working offline
+TEMPLATE_CACHE_FOLDER = os.path.join(os.environ.get("LOCALAPPDATA", os.path.expanduser("~")), "ProjectTracking", "templates")
+TEMPLATE_MAX_AGE_HOURS = 24 # how long a cached template is used before checking the source portal for a newer version
+
+# item properties copied from the template to new Experiences
+TEMPLATE_PROPERTIES = ["type", "typeKeywords", "description", "snippet", "tags", "accessInformation", "licenseInfo", "culture", "url"]
+
+
+# Returns the host name of a portal's organization, ex. smumn.maps.arcgis.com, which is what data sources reference
+def portal_host(gis):
+    url_key = gis.properties.get("urlKey")
+    base_url = gis.properties.get("customBaseUrl")
+    if url_key and base_url:
+        return f"{url_key}.{base_url}"
+    return urlparse(gis.url).netloc
+
+
+def _manifest_path(item_id):
+    return os.path.join(TEMPLATE_CACHE_FOLDER, item_id, "manifest.json")
+
+
+def _read_manifest(item_id):
+    path = _manifest_path(item_id)
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def _write_manifest(item_id, manifest):
+    path = _manifest_path(item_id)
+    with open(f"{path}.tmp", mode='w') as file:
+        json.dump(manifest, file)
+    os.replace(f"{path}.tmp", path)
+
+
+# Downloads the template item's properties, data and resources into a folder for this version of the item
+def _download_template(item, version_folder):
+    if os.path.exists(version_folder):
+        shutil.rmtree(version_folder)
+    resources_folder = os.path.join(version_folder, "resources")
+    os.makedirs(resources_folder)
+
+    with open(os.path.join(version_folder, "data.json"), mode='w') as file:
+        json.dump(item.get_data(try_json=True), file)
+
+    resources = []
+    for resource in item.resources.list():
+        name = resource["resource"] # path inside the item, ex. config/config.json
+        out_folder = os.path.join(resources_folder, os.path.dirname(name))
+        os.makedirs(out_folder, exist_ok=True)
+        item.resources.get(file=name, try_json=False, out_folder=out_folder, out_file_name=os.path.basename(name))
+        resources.append(name)
+
+    return {name: getattr(item, name, None) for name in TEMPLATE_PROPERTIES}, resources
+
+
+# Returns the cached template, checking the source portal for a newer version only when the cache is stale.
+# get_source_gis is only called when the portal has to be contacted.
+def get_template(get_source_gis, item_id):
+    manifest = _read_manifest(item_id)
+    if manifest and time.time() - manifest["checked_at"] < TEMPLATE_MAX_AGE_HOURS * 3600:
+        return manifest
+
+    try:
+        source_gis = get_source_gis()
+        item = source_gis.content.get(item_id)
+        if manifest is None or manifest["modified"] != item.modified:
+            version_folder = os.path.join(TEMPLATE_CACHE_FOLDER, item_id, str(item.modified))
+            properties, resources = _download_template(item, version_folder)
+            manifest = {"item_id": item_id, "modified": item.modified, "folder": version_folder, "source_host": portal_host(source_gis),
+                        "title": item.title, "properties": properties, "resources": resources}
+    except Exception:
+        if manifest is None:
+            raise
+        return manifest # the portal could not be reached, keep working offline with the cached version
+
+    manifest["checked_at"] = time.time()
+    _write_manifest(item_id, manifest)
+
+    # remove older versions once the manifest points at the new one
+    item_folder = os.path.dirname(_manifest_path(item_id))
+    for entry in os.scandir(item_folder):
+        if entry.is_dir() and entry.path != manifest["folder"]:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+    return manifest
+
+
+# Replaces every old ID from the mapping with its new ID
+def _rewrite(text, item_mapping):
+    for old_id, new_id in item_mapping.items():
+        text = text.replace(old_id, new_id)
+    return text
+
+
+# Creates a new Experience from the cached template with its data sources pointed at the new items in the target portal
+def create_from_template(target_gis, template, item_mapping, title, folder):
+    # data sources also reference the portal they live in, so move them from the template's portal to the target's
+    item_mapping = dict(item_mapping)
+    target_host = portal_host(target_gis)
+    if template["source_host"] != target_host:
+        item_mapping[template["source_host"]] = target_host
+
+    with open(os.path.join(template["folder"], "data.json")) as file:
+        data = _rewrite(file.read(), item_mapping)
+
+    item_properties = {name: value for name, value in template["properties"].items() if value is not None}
+    item_properties["title"] = title
+    item_properties["text"] = data
+    new_item = target_gis.content.add(item_properties=item_properties, folder=folder)
+
+    # copy the resources, json resources (like the published config) also reference the data sources
+    resources_folder = os.path.join(template["folder"], "resources")
+    for name in template["resources"]:
+        path = os.path.join(resources_folder, name)
+        if name.endswith(".json"):
+            with open(path) as file:
+                text = _rewrite(file.read(), item_mapping)
+            new_item.resources.add(text=text, folder_name=os.path.dirname(name) or None, file_name=os.path.basename(name))
+        else:
+            new_item.resources.add(file=path, folder_name=os.path.dirname(name) or None, file_name=os.path.basename(name))
+
+    # point the Experience url at the new item
+    if new_item.url and template["item_id"] in new_item.url:
+        new_item.update(item_properties={"url": new_item.url.replace(template["item_id"], new_item.id)})
+
+    return new_item